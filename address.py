@@ -1,22 +1,49 @@
 import typing as T
 
+import numpy as np
+import shapely
 from shapely.geometry import shape, Point
 
 class Address:
-    def __init__(self, data, tags: T.Dict[str, str], tag_maps: T.List[T.Tuple[str, str]] = [], tag_filters={}):
-        self._location = shape(data["geometry"])
-        if not isinstance(self._location, Point):
-            raise ValueError(f"Expected point geometry (got {self._location})")
-
-        self._tags = {**tags}
-        for map_to, map_from in tag_maps:
-            if prop := data["properties"].get(map_from):
-                if tag_filter := tag_filters.get(map_to):
-                    prop = tag_filter(prop)
-                self._tags[map_to] = prop
+    __slots__ = ("_location", "_tags", "_address_tuple", "_no_nearby_street_warning")
 
+    def __init__(self, data, tags: T.Dict[str, str], tag_maps: T.List[T.Tuple[str, str]] = [], tag_filters={}, geometry=None):
+        if geometry is None:
+            geometry = shape(_check_geometry_type(data["geometry"]))
+        elif not isinstance(geometry, Point):
+            raise ValueError(f"Expected point geometry (got {geometry.geom_type})")
+
+        self._location = geometry
+
+        properties = data["properties"]
+        self._tags = tags | {
+            map_to: tag_filter(prop) if (tag_filter := tag_filters.get(map_to)) else prop
+            for map_to, map_from in tag_maps
+            if (prop := properties.get(map_from))
+        }
+
+        self._address_tuple = None
         self._no_nearby_street_warning = None
 
+    @classmethod
+    def from_geometry(cls, geometry, data, tags: T.Dict[str, str], tag_maps: T.List[T.Tuple[str, str]] = [], tag_filters={}) -> "Address":
+        """
+        Creates an address from an already-constructed Shapely geometry, rather
+        than converting `data["geometry"]`.
+        """
+
+        return cls(data, tags, tag_maps, tag_filters, geometry=geometry)
+
+    @classmethod
+    def from_features(cls, features, tags: T.Dict[str, str], tag_maps: T.List[T.Tuple[str, str]] = [], tag_filters={}) -> T.List["Address"]:
+        """
+        Creates addresses for a batch of GeoJSON features, constructing all of
+        their geometries at once.
+        """
+
+        locations = locations_from_geojson([feature["geometry"] for feature in features])
+        return [cls.from_geometry(location, feature, tags, tag_maps, tag_filters) for location, feature in zip(locations, features)]
+
     @property
     def tags(self) -> T.Dict[str, str]:
         return self._tags
@@ -27,7 +54,9 @@ class Address:
 
     @property
     def address_tuple(self) -> T.Tuple[str, str]:
-        return (self.tags.get("unit"), self.tags.get("addr:housenumber"), self.tags.get("addr:street"))
+        if self._address_tuple is None:
+            self._address_tuple = (self.tags.get("unit"), self.tags.get("addr:housenumber"), self.tags.get("addr:street"))
+        return self._address_tuple
 
     @property
     def warnings(self) -> T.Iterator[str]:
@@ -45,3 +74,22 @@ class Address:
 
     def warn_no_nearby_street(self):
         self._no_nearby_street_warning = f"address does not match a street: {self}"
+
+
+def locations_from_geojson(geometries) -> np.ndarray:
+    """
+    Converts a list of GeoJSON Point geometries to Shapely Points with a single
+    call to `shapely.points`.
+    """
+
+    locations = np.empty(len(geometries), dtype=object)
+    if geometries:
+        locations[:] = shapely.points([_check_geometry_type(geometry)["coordinates"][:2] for geometry in geometries])
+    return locations
+
+
+def _check_geometry_type(geometry):
+    geometry_type = geometry["type"] if geometry else None
+    if geometry_type != "Point":
+        raise ValueError(f"Expected point geometry (got {geometry_type})")
+    return geometry
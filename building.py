@@ -1,26 +1,51 @@
-from math import *
+from math import pi
 import typing as T
 
+import numpy as np
+import shapely
 from shapely.geometry import shape, Point, Polygon, MultiPolygon
 
 class Building:
-    def __init__(self, data, tags: T.Dict[str, str], tag_maps: T.List[T.Tuple[str, str]] = [], tag_filters={}):
-        self._shape = squarify(shape(data["geometry"]))
-        if not (isinstance(self._shape, Polygon) or isinstance(self._shape, MultiPolygon)):
-            raise ValueError(f"Expected a Polygon or MultiPolygon geometry (got {self._location})")
+    __slots__ = ("_shape", "_tags", "_location", "addresses")
 
-        if isinstance(self._shape, Polygon) and len(self._shape.exterior.coords) >= 100:
-            self._shape = self._shape.simplify(0.000004)
+    def __init__(self, data, tags: T.Dict[str, str], tag_maps: T.List[T.Tuple[str, str]] = [], tag_filters={}, geometry=None):
+        if geometry is None:
+            geometry = simplify_detailed(squarify_all([shape(_check_geometry_type(data["geometry"]))]))[0]
+        elif not (isinstance(geometry, Polygon) or isinstance(geometry, MultiPolygon)):
+            raise ValueError(f"Expected a Polygon or MultiPolygon geometry (got {geometry.geom_type})")
 
-        self._tags = {**tags}
-        for map_to, map_from in tag_maps:
-            if prop := data["properties"].get(map_from):
-                if tag_filter := tag_filters.get(map_to):
-                    prop = tag_filter(prop)
-                self._tags[map_to] = prop
+        self._shape = geometry
 
+        properties = data["properties"]
+        self._tags = tags | {
+            map_to: tag_filter(prop) if (tag_filter := tag_filters.get(map_to)) else prop
+            for map_to, map_from in tag_maps
+            if (prop := properties.get(map_from))
+        }
+
+        self._location = None
         self.addresses = []
 
+    @classmethod
+    def from_geometry(cls, geometry, data, tags: T.Dict[str, str], tag_maps: T.List[T.Tuple[str, str]] = [], tag_filters={}) -> "Building":
+        """
+        Creates a building from an already-constructed Shapely geometry, rather
+        than converting `data["geometry"]`. The geometry is used as-is, so it
+        should already be squared and simplified.
+        """
+
+        return cls(data, tags, tag_maps, tag_filters, geometry=geometry)
+
+    @classmethod
+    def from_features(cls, features, tags: T.Dict[str, str], tag_maps: T.List[T.Tuple[str, str]] = [], tag_filters={}) -> T.List["Building"]:
+        """
+        Creates buildings for a batch of GeoJSON features, constructing,
+        squaring, and simplifying all of their geometries at once.
+        """
+
+        shapes = simplify_detailed(squarify_all(shapes_from_geojson([feature["geometry"] for feature in features])))
+        return [cls.from_geometry(geometry, feature, tags, tag_maps, tag_filters) for geometry, feature in zip(shapes, features)]
+
     @property
     def tags(self) -> T.Dict[str, str]:
         return self._tags
@@ -31,7 +56,86 @@ class Building:
 
     @property
     def location(self) -> Point:
-        return self._shape.representative_point()
+        if self._location is None:
+            self._location = self._shape.representative_point()
+        return self._location
+
+
+def shapes_from_geojson(geometries) -> np.ndarray:
+    """
+    Converts a list of GeoJSON geometries to Shapely geometries.
+
+    The rings of every Polygon and MultiPolygon are flattened into one array of
+    vertices and then built with a single call to each of Shapely's vectorized
+    constructors, instead of one `shape()` call per geometry. Raises a
+    ValueError for any other type of geometry.
+    """
+
+    shapes = np.empty(len(geometries), dtype=object)
+
+    coords = []
+    # Index of the ring each vertex belongs to
+    ring_indices = []
+    # Index of the polygon each ring belongs to
+    polygon_indices = []
+    # Index of the geometry each polygon belongs to
+    polygon_geometries = []
+    multipolygons = []
+
+    for i, geometry in enumerate(geometries):
+        match _check_geometry_type(geometry)["type"]:
+            case "Polygon":
+                polygons = [geometry["coordinates"]]
+            case "MultiPolygon" if geometry["coordinates"]:
+                polygons = geometry["coordinates"]
+                multipolygons.append(i)
+            case _:
+                # Empty MultiPolygon, nothing to batch
+                shapes[i] = shape(geometry)
+                continue
+
+        for rings in polygons:
+            for ring in rings:
+                coords += [coord[:2] for coord in ring]
+                ring_indices += [len(polygon_indices)] * len(ring)
+                polygon_indices.append(len(polygon_geometries))
+            polygon_geometries.append(i)
+
+    if polygon_geometries:
+        rings = shapely.linearrings(coords, indices=ring_indices)
+        polygons = shapely.polygons(rings, indices=polygon_indices)
+
+        polygon_geometries = np.asarray(polygon_geometries)
+        multi = np.isin(polygon_geometries, multipolygons)
+        shapes[polygon_geometries[~multi]] = polygons[~multi]
+        if multipolygons:
+            _, multipolygon_indices = np.unique(polygon_geometries[multi], return_inverse=True)
+            shapes[multipolygons] = shapely.multipolygons(polygons[multi], indices=multipolygon_indices)
+
+    return shapes
+
+
+def simplify_detailed(shapes: np.ndarray) -> np.ndarray:
+    """
+    Simplifies the polygons in an array that have 100 or more exterior
+    vertices, with one call to `shapely.simplify`.
+    """
+
+    detailed = (
+        (shapely.get_type_id(shapes) == shapely.GeometryType.POLYGON)
+        & (shapely.get_num_coordinates(shapely.get_exterior_ring(shapes)) >= 100)
+    )
+
+    shapes = shapes.copy()
+    shapes[detailed] = shapely.simplify(shapes[detailed], 0.000004)
+    return shapes
+
+
+def _check_geometry_type(geometry):
+    geometry_type = geometry["type"] if geometry else None
+    if geometry_type not in ("Polygon", "MultiPolygon"):
+        raise ValueError(f"Expected a Polygon or MultiPolygon geometry (got {geometry_type})")
+    return geometry
 
 
 def squarify(polygon: Polygon) -> Polygon:
@@ -51,96 +155,153 @@ def squarify(polygon: Polygon) -> Polygon:
     returned.
     """
 
+    return squarify_all([polygon])[0]
+
+
+@np.errstate(all="ignore")
+def squarify_all(shapes) -> np.ndarray:
+    """
+    Squarifies an array of building outlines, like calling `squarify` on each
+    one. Every step runs over the sides of all the polygons at once, since
+    most buildings only have a handful of corners and doing them one at a time
+    would be dominated by per-call overhead. Anything that isn't a Polygon is
+    returned unchanged.
+    """
+
+    shapes = np.asarray(shapes, dtype=object)
+    result = shapes.copy()
+
+    polygon_indices = np.flatnonzero(shapely.get_type_id(shapes) == shapely.GeometryType.POLYGON)
+    polygons = shapes[polygon_indices]
+    if len(polygons) == 0:
+        return result
+
+    # Get the coordinates of the corners. Each side runs from one corner to the
+    # next one in the same ring; `p` and `n` are the start and end of each side
+    # and `side_polygons` is the polygon it belongs to.
+    coords, ring_indices = shapely.get_coordinates(shapely.get_exterior_ring(polygons), return_index=True)
+    tile_coords = to_tile(coords)
+    is_side = ring_indices[:-1] == ring_indices[1:]
+    p = tile_coords[:-1][is_side]
+    n = tile_coords[1:][is_side]
+    side_polygons = ring_indices[:-1][is_side]
+    num_sides = np.bincount(side_polygons, minlength=len(polygons))
+
+    mod_angle = 45 * pi / 180
+    snap_threshold = 10 * pi / 180
+
+    # For each side of each polygon, find the center point and the angle
+    centers = (p + n) / 2
+    angles = np.arctan2(n[:, 1] - p[:, 1], n[:, 0] - p[:, 0])
+    side_lens = np.hypot(n[:, 0] - p[:, 0], n[:, 1] - p[:, 1])
+
+    # Find the average angle of each polygon, weighted by side length. Note
+    # that the angle average is mod 45 from the beginning--we want the average
+    # of (each angle mod 45), not (the average of each angle) mod 45, otherwise
+    # the result will be meaningless
+    angle_sums = np.bincount(side_polygons, (angles % mod_angle) * side_lens, len(polygons))
+    len_sums = np.bincount(side_polygons, side_lens, len(polygons))
+    avg_angles = ((angle_sums / len_sums) % mod_angle)[side_polygons]
+
+    # Snap each side to the 45-degree increments of its polygon's average angle
+    diffs = angles % mod_angle - avg_angles
+    snap = (np.abs(diffs) < snap_threshold) | (np.abs(diffs) > mod_angle - snap_threshold)
+    angles = np.where(snap, angles - diffs, angles)
+
+    # Now that we have a list of sides by center point and (now snapped) angle,
+    # intersect each one with the next side of the same polygon to get back to
+    # a list of corners
+    first_sides = np.cumsum(num_sides) - num_sides
+    next_sides = np.arange(len(side_polygons)) + 1
+    last_sides = next_sides == (first_sides + num_sides)[side_polygons]
+    next_sides[last_sides] = first_sides[side_polygons[last_sides]]
+
+    ax, ay = centers[:, 0], centers[:, 1]
+    bx, by = ax[next_sides], ay[next_sides]
+    tan_a = np.tan(angles)
+    tan_b = tan_a[next_sides]
+
+    # I hope you remember high school algebra and precalc
+    x = (-ay + by - tan_b * bx + tan_a * ax) / (tan_a - tan_b)
+    y = tan_a * (x - ax) + ay
+    points = from_tile(np.column_stack((x, y)))
+
+    # Parallel adjacent sides and such give us infinities and NaNs, and
+    # degenerate polygons don't have enough sides to make a new one. Leave
+    # those polygons alone.
+    bad_points = np.bincount(side_polygons, ~np.isfinite(points).all(axis=1), len(polygons)) > 0
+    candidates = np.flatnonzero(~bad_points & (num_sides >= 3))
+    if len(candidates) == 0:
+        return result
+
+    keep_sides = np.isin(side_polygons, candidates)
+    square_polygons = shapely.polygons(shapely.linearrings(
+        points[keep_sides],
+        indices=np.searchsorted(candidates, side_polygons[keep_sides]),
+    ))
+    polygons = polygons[candidates]
+    polygon_indices = polygon_indices[candidates]
+
+    # There's no guarantee the algorithm generates valid polygons. We don't
+    # need a super reliable algorithm here, just something to handle the
+    # majority of cases, so just ignore these polygons.
+    #
+    # Then find both the union and the intersection of the new and old
+    # polygons. Divide the area of the intersection by the area of the union.
+    # This gives us a number between 0 and 1 that measures how much the
+    # polygons overlap. If they don't almost exactly overlap, leave the
+    # squaring for the manual review step.
+    #
+    # The intersection can't be bigger than the smaller polygon, or the union
+    # smaller than the bigger one, so if the areas alone are too different we
+    # can skip the expensive part.
+    old_areas = shapely.area(polygons)
+    new_areas = shapely.area(square_polygons)
+    close = shapely.is_valid(square_polygons) & (np.minimum(old_areas, new_areas) / np.maximum(old_areas, new_areas) > 0.95)
+
+    intersections = _intersection_areas(square_polygons[close], polygons[close])
+    unions = old_areas[close] + new_areas[close] - intersections
+    overlapping = intersections / unions > 0.95
+    result[polygon_indices[close][overlapping]] = square_polygons[close][overlapping]
+
+    return result
+
+
+def _intersection_areas(a: np.ndarray, b: np.ndarray) -> np.ndarray:
     try:
-        # Get the coordinates of the corners
-        coords = polygon.exterior.coords
-
-        mod_angle = 45 * pi / 180
-        snap_threshold = 10 * pi / 180
-
-        # For each side of the polygon, find the center point and the angle
-        segments = []
-        len_sum = 0
-        angle_sum = 0
-        for i, (px, py) in enumerate(coords):
-            if i == len(coords) - 1:
-                continue
-            nx, ny = coords[(i+1)%len(coords)]
-
-            def to_tile(x, y):
-                lat_rad = y / 180 * pi
-                return (
-                    (x + 180) / 360,
-                    (1 - (log(tan(lat_rad) + 1/cos(lat_rad)) / pi)) / 2
-                )
-
-            nx, ny = to_tile(nx, ny)
-            px, py = to_tile(px, py)
-            center = (px + nx) / 2, (py + ny) / 2
-
-            angle = atan2(ny - py, nx - px)
-
-            seg_len = sqrt((px - nx) ** 2 + (py - ny) ** 2)
-            len_sum += seg_len
-            # Note that the angle average is mod 45 from the beginning--we want
-            # the average of (each angle mod 45), not (the average of each angle)
-            # mod 45, otherwise the result will be meaningless
-            angle_sum += (angle % mod_angle) * seg_len
-            segments.append((center, angle))
-
-        # Find the average angle, weighted by segment length
-        avg_angle = (angle_sum / len_sum) % mod_angle
-
-        # Snap each segment to the 45-degree increments of the average angle
-        def snap_segment(segment):
-            center, angle = segment
-            diff = angle % mod_angle - avg_angle
-            if abs(diff) < snap_threshold:
-                return center, angle - diff
-            elif abs(diff) > mod_angle - snap_threshold:
-                return center, angle - diff
-            else:
-                return center, angle
-
-        segments = [snap_segment(segment) for segment in segments]
-
-        # Now that we have a list of segments by center point and (now snapped)
-        # angle, intersect adjacent lines to get back to a list of corners
-        points = []
-        for i, ((ax, ay), angleA) in enumerate(segments):
-            (bx, by), angleB = segments[(i+1)%len(segments)]
-
-            # I hope you remember high school algebra and precalc
-            x = (-ay + by - tan(angleB) * bx + tan(angleA) * ax) / (tan(angleA) - tan(angleB))
-            y = tan(angleA) * (x - ax) + ay
-
-            def from_tile(x, y):
-                return (
-                    x * 360 - 180,
-                    atan(sinh(pi * (1 - 2 * y))) * 180 / pi
-                )
-            points.append(from_tile(x, y))
-
-        square_polygon = Polygon(points)
-
-        # There's no guarantee the algorithm generates valid polygons. We don't
-        # need a super reliable algorithm here, just something to handle the
-        # majority of cases, so just ignore this polygon.
-        if not square_polygon.is_valid:
-            return polygon
-
-        # Find both the union and the intersection of the new and old polygons.
-        # Divide the area of the intersection by the area of the union. This
-        # gives us a number between 0 and 1 that measures how much the polygons
-        # overlap. If they don't almost exactly overlap, leave the squaring for
-        # the manual review step.
-        intersection = square_polygon.intersection(polygon).area
-        union = square_polygon.union(polygon).area
-        if intersection / union > 0.95:
-            return square_polygon
-        else:
-            return polygon
-    except Exception as e:
-        # We might get ZeroDivisionErrors and such, just ignore them and return
-        # the original polygon
-        return polygon
+        return shapely.area(shapely.intersection(a, b))
+    except Exception:
+        # A single bad input polygon fails the whole batch, so fall back to
+        # doing them one at a time. Anything that fails gets NaN, which is
+        # never accepted as overlapping.
+        areas = np.full(len(a), np.nan)
+        for i, (x, y) in enumerate(zip(a, b)):
+            try:
+                areas[i] = x.intersection(y).area
+            except Exception:
+                pass
+        return areas
+
+
+def to_tile(coords: np.ndarray) -> np.ndarray:
+    """
+    Projects an (N, 2) array of longitude/latitude pairs into Web Mercator
+    tile coordinates (scaled to the range 0-1).
+    """
+
+    lat_rad = coords[:, 1] / 180 * pi
+    return np.column_stack((
+        (coords[:, 0] + 180) / 360,
+        (1 - (np.log(np.tan(lat_rad) + 1 / np.cos(lat_rad)) / pi)) / 2,
+    ))
+
+
+def from_tile(coords: np.ndarray) -> np.ndarray:
+    """
+    Inverse of `to_tile`.
+    """
+
+    return np.column_stack((
+        coords[:, 0] * 360 - 180,
+        np.arctan(np.sinh(pi * (1 - 2 * coords[:, 1]))) * 180 / pi,
+    ))
@@ -1,8 +1,13 @@
-from decimal import Decimal
 from lxml import etree
 from math import cos, tan, pi, floor, log
+import numpy as np
 import typing as T
-from shapely.geometry import MultiPolygon, Point
+import shapely
+from shapely.geometry import MultiPolygon
+
+
+# Zoom level of the tiles changes are split into
+TILE_ZOOM = 15
 
 
 class ChangesetEmitter:
@@ -14,63 +19,89 @@ class ChangesetEmitter:
     def add_change(self, change):
         self.changes.append(change)
 
+    def add_changes(self, changes):
+        self.changes.extend(changes)
+
     def get_warnings(self):
         for change in self.changes:
             yield from change.get_warnings()
 
     @property
-    def warnings(self):
-        return list(self.get_warnings())
+    def warnings(self) -> T.Iterator[str]:
+        return self.get_warnings()
 
     def write_to(self, path, generator=None, changeset_tags={}, source_file=None):
-        self._xml = etree.Element("osm", version="0.6", generator=generator, **{"upload-changeset": "-1"})
+        # Elements are streamed to the file as each change is emitted, so only
+        # one change's worth of XML is held in memory at a time. Changes add
+        # elements to self._xml, which is written out and cleared after each
+        # one.
+        with etree.xmlfile(path, encoding="utf8") as xf:
+            xf.write_declaration()
+            with xf.element("osm", version="0.6", generator=generator, **{"upload-changeset": "-1"}):
+                xf.write("\n")
 
-        changeset = etree.Element("changeset", id="-1")
+                changeset = etree.Element("changeset", id="-1")
 
-        for key, val in changeset_tags.items():
-            changeset.append(etree.Element("tag", k=key, v=val))
+                for key, val in changeset_tags.items():
+                    etree.SubElement(changeset, "tag", k=key, v=val)
 
-        if source_file:
-            changeset.append(etree.Element("tag", k="source_file", v=source_file))
+                if source_file:
+                    etree.SubElement(changeset, "tag", k="source_file", v=source_file)
 
-        self._xml.append(changeset)
+                xf.write(changeset, pretty_print=True)
 
-        for change in self.changes:
-            change.emit_xml(self)
+                for change in self.changes:
+                    self._xml = etree.Element("osm")
+                    change.emit_xml(self)
+                    for element in self._xml:
+                        xf.write(element, pretty_print=True)
 
-        with open(path, "wb") as f:
-            f.write(etree.tostring(self._xml, pretty_print=True, xml_declaration=True, encoding="utf8"))
+        self._xml = None
 
     def get_id(self, type: str):
         self._next_id[type] -= 1
         return str(self._next_id[type])
 
     def add_node(self, location, tags=None):
-        location = Point(location)
+        # Accept raw (x, y) coordinate tuples as well as Points, so ways don't
+        # need to build a Point for every vertex
+        if isinstance(location, tuple):
+            x, y = location[0], location[1]
+        else:
+            x, y = location.x, location.y
+
+        key = node_key(int(float(x*10**7)), int(float(y*10**7)))
+        if key in self._nodes:
+            return self._nodes[key]
 
-        rlon = int(float(location.x*10**7))
-        rlat = int(float(location.y*10**7))
-        if (rlon, rlat) in self._nodes:
-            return self._nodes[(rlon, rlat)]
+        return self._create_node(key, x, y, tags)
 
+    def _create_node(self, key, x, y, tags=None):
         id = self.get_id("node")
-        node = etree.Element("node", visible="true", id=id)
-        node.set('lat', str(Decimal(location.y)*Decimal(1)))
-        node.set('lon', str(Decimal(location.x)*Decimal(1)))
+        node = etree.SubElement(self._xml, "node", {"visible": "true", "id": id, "lat": format_coord(y), "lon": format_coord(x)})
         if tags:
             for key, val in tags.items():
-                node.append(etree.Element('tag', k=key, v=val))
-        self._nodes[(rlon, rlat)] = node
-        self._xml.append(node)
-        return node
+                etree.SubElement(node, 'tag', k=key, v=val)
+        self._nodes[key] = id
+        return id
 
     def add_way(self, points):
-        nodes = [self.add_node(p) for p in points]
+        # Quantize all the coordinates at once, the same way add_node does
+        coords = np.asarray(points, dtype=np.float64)[:, :2]
+        rcoords = (coords * 10**7).astype(np.int64)
+        keys = node_key(rcoords[:, 0], rcoords[:, 1])
+
+        node_ids = []
+        for key, (x, y) in zip(keys.tolist(), coords.tolist()):
+            node_id = self._nodes.get(key)
+            if node_id is None:
+                node_id = self._create_node(key, x, y)
+            node_ids.append(node_id)
+
         id = self.get_id("way")
-        way = etree.Element("way", visible="true", id=id)
-        for node in nodes:
-            way.append(etree.Element("nd", ref=node.get("id")))
-        self._xml.append(way)
+        way = etree.SubElement(self._xml, "way", visible="true", id=id)
+        for node_id in node_ids:
+            etree.SubElement(way, "nd", ref=node_id)
         return way
 
     def add_polygon(self, shape, tags):
@@ -82,24 +113,23 @@ class ChangesetEmitter:
             polygons = [shape]
 
         for polygon in polygons:
-            outers.append(self.add_way(list(polygon.exterior.coords)))
+            outers.append(self.add_way(polygon.exterior.coords))
             for interior in polygon.interiors:
-                interiors.append(self.add_way(list(interior.coords)))
+                interiors.append(self.add_way(interior.coords))
 
         if len(interiors) > 0 or len(outers) > 1:
-            relation = etree.Element('relation', visible='true', id=str(self.get_id("way")))
+            relation = etree.SubElement(self._xml, 'relation', visible='true', id=str(self.get_id("way")))
             for outer in outers:
-                relation.append(etree.Element('member', type='way', role='outer', ref=outer.get('id')))
+                etree.SubElement(relation, 'member', type='way', role='outer', ref=outer.get('id'))
             for interior in interiors:
-                relation.append(etree.Element('member', type='way', role='inner', ref=interior.get('id')))
-            relation.append(etree.Element('tag', k='type', v='multipolygon'))
-            self._xml.append(relation)
+                etree.SubElement(relation, 'member', type='way', role='inner', ref=interior.get('id'))
+            etree.SubElement(relation, 'tag', k='type', v='multipolygon')
             way = relation
         else:
             way = outers[0]
 
         for key, val in tags.items():
-            way.append(etree.Element('tag', k=key, v=val))
+            etree.SubElement(way, 'tag', k=key, v=val)
 
         return way
 
@@ -107,10 +137,44 @@ class ChangesetEmitter:
         self._xml.append(element)
 
 
+def tile_indices(changes) -> T.Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the x and y tile of each change as arrays, like `Change.tile_name`,
+    but projects all the locations at once.
+    """
+
+    coords = shapely.get_coordinates([change.location for change in changes])
+    n = 2 ** TILE_ZOOM
+    lat_rad = coords[:, 1] / 180 * pi
+    xtiles = np.floor(n * ((coords[:, 0] + 180) / 360)).astype(np.int64)
+    ytiles = np.floor(n * (1 - (np.log(np.tan(lat_rad) + 1/np.cos(lat_rad)) / pi)) / 2).astype(np.int64)
+    return xtiles, ytiles
+
+
+def node_key(rlon, rlat):
+    """
+    Packs a pair of coordinates in units of 1e-7 degrees into a single integer
+    for node deduplication. Works on ints or arrays of int64.
+    """
+
+    return rlon << 32 | (rlat & 0xFFFFFFFF)
+
+
+def format_coord(value: float) -> str:
+    """
+    Formats a latitude or longitude with the 7 decimal places OSM stores,
+    dropping trailing zeros.
+    """
+
+    return f"{value:.7f}".rstrip("0").rstrip(".")
+
+
 class Change:
+    __slots__ = ()
+
     @property
-    def warnings(self) -> T.List[str]:
-        return list(self.get_warnings())
+    def warnings(self) -> T.Iterator[str]:
+        return self.get_warnings()
 
     def get_warnings(self) -> T.Iterator[str]:
         yield from []
@@ -122,7 +186,7 @@ class Change:
     @property
     def tile_name(self):
         point = self.location
-        zoom = 15
+        zoom = TILE_ZOOM
         n = 2 ** zoom
         lat_rad = point.y / 180 * pi
         xtile = floor(n * ((point.x + 180) / 360))
@@ -134,6 +198,8 @@ class Change:
 
 
 class NewBuildingChange(Change):
+    __slots__ = ("building",)
+
     def __init__(self, building):
         self.building = building
 
@@ -146,6 +212,8 @@ class NewBuildingChange(Change):
 
 
 class NewAddressChange(Change):
+    __slots__ = ("address",)
+
     def __init__(self, address):
         self.address = address
 
@@ -161,6 +229,8 @@ class NewAddressChange(Change):
 
 
 class NewBuildingWithAddressChange(Change):
+    __slots__ = ("building", "address")
+
     def __init__(self, building, address):
         self.building = building
         self.address = address
@@ -173,12 +243,12 @@ class NewBuildingWithAddressChange(Change):
         return self.address.location
 
     def emit_xml(self, ctx: ChangesetEmitter):
-        element = ctx.add_polygon(self.building.shape, self.building.tags)
-        for key, val in self.address.tags.items():
-            element.append(etree.Element('tag', k=key, v=val))
+        ctx.add_polygon(self.building.shape, { **self.building.tags, **self.address.tags })
 
 
 class UpdateBuildingAddressChange(Change):
+    __slots__ = ("osm_element", "address")
+
     def __init__(self, osm_element, address):
         self.osm_element = osm_element
         self.address = address
@@ -198,15 +268,15 @@ class UpdateBuildingAddressChange(Change):
         element = etree.Element(self.osm_element["type"], id=str(self.osm_element["id"]), version=str(self.osm_element["version"]), action="modify")
 
         for key, val in { **self.osm_element["tags"], **self.address.tags }.items():
-            element.append(etree.Element('tag', k=key, v=val))
+            etree.SubElement(element, 'tag', k=key, v=val)
 
         if members := self.osm_element.get("members"):
             for member in members:
-                element.append(etree.Element(member["type"], ref=str(member["ref"])))
+                etree.SubElement(element, member["type"], ref=str(member["ref"]))
 
         if nodes := self.osm_element.get("nodes"):
             for nodeid in nodes:
-                element.append(etree.Element("nd", ref=str(nodeid)))
+                etree.SubElement(element, "nd", ref=str(nodeid))
 
         ctx.add_xml(element)
 
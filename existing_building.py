@@ -1,6 +1,8 @@
 from shapely.geometry import Polygon
 
 class ExistingBuilding:
+    __slots__ = ("shape", "osm_element", "addresses")
+
     def __init__(self, shape, osm_element):
         self.shape = Polygon(shape)
         self.osm_element = osm_element
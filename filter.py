@@ -1,4 +1,4 @@
-import re
+import functools, re
 import typing as T
 
 class Filter:
@@ -10,7 +10,7 @@ class Filter:
                 if not line.isspace() and not line.startswith("#")
             ]
 
-        self._filters = [_create_filter(code) for code in self._filter_codes]
+        self._filters = _create_filters(self._filter_codes)
 
     def __call__(self, string: str) -> str:
         for filter in self._filters:
@@ -22,7 +22,65 @@ class Filter:
 
     def __setstate__(self, state):
         self._filter_codes = state
-        self._filters = [_create_filter(code) for code in self._filter_codes]
+        self._filters = _create_filters(self._filter_codes)
+
+
+# Matches filters that replace a single whole word with plain text, like
+# "\bAVE\b => Avenue"
+_WORD_FILTER = re.compile(r"\\b(\w+)\\b => ([^\\]*)")
+
+
+def _create_filters(filter_codes: T.List[str]) -> T.List[T.Callable[[str], str]]:
+    """
+    Creates the filter functions for a list of filter codes.
+
+    Runs of whole-word replacements are combined into one regex that looks up
+    the replacement for whichever word matched, so a long list of
+    abbreviations is a single pass over the string instead of one per rule.
+    Filters are applied in order, so a word is only added to the current run
+    if none of the run's earlier replacements contain it; otherwise the
+    combined pass would miss matches that running the rules one by one would
+    find.
+    """
+
+    filters = []
+
+    # Filter codes in the current run, by the (lowercase) word they replace
+    run = {}
+    # Every word that appears in a replacement in the current run
+    replaced_words = set()
+
+    def end_run():
+        if len(run) == 1:
+            filters.append(_create_filter(*run.values()))
+        elif run:
+            filters.append(_create_word_filter({
+                word: _WORD_FILTER.fullmatch(code).group(2) for word, code in run.items()
+            }))
+        run.clear()
+        replaced_words.clear()
+
+    for code in filter_codes:
+        match = _WORD_FILTER.fullmatch(code)
+        if match and code.count(" => ") == 1:
+            word, replace = match.groups()
+            word = word.lower()
+            if word in replaced_words:
+                end_run()
+            run.setdefault(word, code)
+            replaced_words.update(token.lower() for token in re.findall(r"\w+", replace))
+        else:
+            end_run()
+            filters.append(_create_filter(code))
+
+    end_run()
+    return filters
+
+
+def _create_word_filter(words: T.Dict[str, str]) -> T.Callable[[str], str]:
+    regex = re.compile(r"\b(" + "|".join(re.escape(word) for word in words) + r")\b", re.IGNORECASE)
+
+    return functools.partial(regex.sub, lambda match: words[match.group(1).lower()])
 
 
 def _create_filter(filter: str) -> T.Callable[[str], str]:
@@ -39,8 +97,4 @@ def _create_filter(filter: str) -> T.Callable[[str], str]:
                 raise Exception(f"invalid filter: {filter}")
             regex_code, replace = segments
             regex = re.compile(regex_code, re.IGNORECASE)
-
-            def func(string: str):
-                return regex.sub(replace, string)
-
-            return func
+            return functools.partial(regex.sub, replace)
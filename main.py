@@ -1,11 +1,12 @@
-import argparse, hashlib, itertools, json, os, sys, time
-from collections import defaultdict
+import argparse, functools, hashlib, itertools, multiprocessing, os, sqlite3, sys, time, zlib
 from lxml import etree
-from multiprocessing import Pool
+from concurrent.futures import ThreadPoolExecutor
 
 from fiona import collection
+import numpy as np
+import orjson
 import requests
-from rtree import index
+import shapely
 from shapely.geometry import Point, MultiPoint, MultiLineString, Polygon, MultiPolygon, LineString
 
 from address import Address
@@ -14,6 +15,8 @@ from changes import *
 from existing_building import ExistingBuilding
 from filter import Filter
 
+OVERPASS_ENDPOINT = "https://overpass-api.de/api/interpreter"
+
 def main():
     args = argparse.ArgumentParser(fromfile_prefix_chars="@")
     args.convert_arg_line_to_args = convert_arg_line_to_args
@@ -31,6 +34,10 @@ def main():
     args.add_argument("--map-building-tag", dest="building_tag_maps", action="append", default=[], help="mapping of <osm tag>=<shapefile property>")
     args.add_argument("--add-building-tag", dest="building_tags", action="append", default=[], help="mapping of <osm tag>=<shapefile property>")
 
+    args.add_argument("--max-street-distance", dest="max_street_distance", default=None, type=float, help="also warn about addresses farther than this from a street of their name, in degrees (defaults to only checking the name)")
+
+    args.add_argument("--overpass-cache-max-age", dest="overpass_cache_max_age", default=None, type=float, help="seconds after which cached overpass responses are revalidated (defaults to never)")
+
     args.add_argument("--tag-filters", dest="tag_filters", action="append", default=[], help="pairs of tag,file where tag is the output tag to apply filter to and file is a file full of filters, one per line")
 
     if len(sys.argv) == 1:
@@ -49,110 +56,157 @@ def main():
     addresses = []
     buildings = []
 
-    points = MultiPoint()
+    # Coordinates of every input address and building, to find the area to
+    # download existing data for
+    input_coords = []
 
     if not opts.addresses and not opts.buildings:
         print(f"No addresses or buildings specified. See {sys.argv[0]} --help.")
         exit(1)
 
-    if opts.addresses:
-        with section("Reading addresses"):
-            address_tags = { tag.split("=", 1)[0]: tag.split("=", 1)[1] for tag in opts.address_tags }
-            address_tag_maps = [(tag.split("=", 1)[0], tag.split("=", 1)[1]) for tag in opts.address_tag_maps]
-            with collection(opts.addresses, "r") as shapefile:
-                with Pool(opts.jobs) as p:
-                    addresses = list(p.imap_unordered(PoolFunc(Address, address_tags, address_tag_maps, tag_filters), shapefile, chunksize=1024))
-            points = MultiPoint([*points.geoms, *[address.location for address in addresses]])
-
-    if opts.buildings:
-        with section("Reading buildings"):
-            building_tags = { tag.split("=", 1)[0]: tag.split("=", 1)[1] for tag in opts.building_tags }
-            building_tag_maps = [(tag.split("=", 1)[0], tag.split("=", 1)[1]) for tag in opts.building_tag_maps]
-            with collection(opts.buildings, "r") as shapefile:
-                with Pool(opts.jobs) as p:
-                    buildings = list(p.imap_unordered(PoolFunc(Building, building_tags, building_tag_maps, tag_filters), shapefile, chunksize=1024))
-            points = MultiPoint([*points.geoms, *[building.location for building in buildings]])
+    # Forked workers start out with everything already imported and set up,
+    # rather than importing it all again. Newer Pythons no longer default to
+    # fork on Linux, and it isn't safe with macOS system libraries.
+    start_method = "fork" if sys.platform != "darwin" and "fork" in multiprocessing.get_all_start_methods() else None
+
+    # Both inputs are read with the same pool of workers, rather than starting
+    # a new set of processes for each
+    with multiprocessing.get_context(start_method).Pool(opts.jobs) as p:
+        if opts.addresses:
+            with section("Reading addresses"):
+                address_tags = dict(parse_kv_list(opts.address_tags))
+                address_tag_maps = parse_kv_list(opts.address_tag_maps)
+                with collection(opts.addresses, "r") as shapefile:
+                    spans = [(start, start + 1024) for start in range(0, len(shapefile), 1024)]
+                addresses = list(itertools.chain.from_iterable(p.imap_unordered(PoolFunc(read_features, opts.addresses, Address.from_features, address_tags, address_tag_maps, tag_filters), spans)))
+                input_coords.append(shapely.get_coordinates([address.location for address in addresses]))
+
+        if opts.buildings:
+            with section("Reading buildings"):
+                building_tags = dict(parse_kv_list(opts.building_tags))
+                building_tag_maps = parse_kv_list(opts.building_tag_maps)
+                with collection(opts.buildings, "r") as shapefile:
+                    spans = [(start, start + 1024) for start in range(0, len(shapefile), 1024)]
+                buildings = list(itertools.chain.from_iterable(p.imap_unordered(PoolFunc(read_features, opts.buildings, Building.from_features, building_tags, building_tag_maps, tag_filters), spans)))
+                input_coords.append(shapely.get_coordinates([building.location for building in buildings]))
 
     with section("Downloading existing data"):
-        poly = " ".join([f"{lat} {lon}" for lon, lat in points.convex_hull.exterior.coords])
-
-        with section("  Downloading existing addresses from overpass"):
-            existing_address_result = overpass_query(f'[out:json][timeout:120]; ( node[~"^addr:.*$"~".*"](poly:"{poly}"); way[~"^addr:.*$"~".*"](poly:"{poly}"); relation[~"^addr:.*$"~".*"](poly:"{poly}"); ); out tags center;')
-            with section("    Processing addresses"):
-                existing_addresses = defaultdict(list)
-                for element in existing_address_result['elements']:
-                    existing_addresses[(element['tags'].get('addr:unit'), element['tags'].get('addr:housenumber'), element['tags'].get('addr:street'))].append(overpass_to_geom(element))
-                existing_addresses = { name: MultiPoint(points) for name, points in existing_addresses.items() }
-
-        with section("  Downloading existing buildings from overpass"):
-            existing_building_result = overpass_query(f'[out:json][timeout:120]; ( way["building"](poly:"{poly}"); relation["building"](poly:"{poly}"); ); out meta geom;')
-            with section("    Processing buildings"):
-                existing_buildings = [
-                    ExistingBuilding(overpass_to_geom(element), element) for element in existing_building_result['elements']
-                ]
-
-        with section("  Downloading streets from overpass"):
-            existing_street_result = overpass_query(f'[out:json][timeout:120]; way["highway"](poly:"{poly}"); out tags geom;')
-            with section("    Processing streets"):
-                existing_streets = defaultdict(list)
-                for element in existing_street_result['elements']:
-                    name = element['tags'].get('name')
-                    existing_streets[name].append(overpass_to_geom(element))
-                existing_streets = { name: MultiLineString(lines) for name, lines in existing_streets.items() }
+        # Overpass answers a bounding box straight from its spatial index, which
+        # is much cheaper than testing every candidate against a polygon. The
+        # few extra elements outside the convex hull of the input are harmless.
+        input_coords = np.concatenate(input_coords)
+        (west, south), (east, north) = input_coords.min(axis=0), input_coords.max(axis=0)
+        bbox = f"{south},{west},{north},{east}"
+
+        with section("  Downloading existing addresses, buildings and streets from overpass"):
+            # Buildings need their metadata, since updating one needs its
+            # version. Only tags and geometry are used for the rest, and in no
+            # particular order, so save Overpass sorting them by id.
+            existing_address_result, existing_building_result, existing_street_result = overpass_query_sets([
+                (f'( node[~"^addr:.*$"~".*"]({bbox}); way[~"^addr:.*$"~".*"]({bbox}); relation[~"^addr:.*$"~".*"]({bbox}); )', "out tags center qt"),
+                (f'( way["building"]({bbox}); relation["building"]({bbox}); )', "out meta geom"),
+                (f'way["highway"]({bbox})', "out tags geom qt"),
+            ], max_age=opts.overpass_cache_max_age)
+
+        with section("  Processing addresses"):
+            existing_addresses = group_geometries(
+                [(element['tags'].get('addr:unit'), element['tags'].get('addr:housenumber'), element['tags'].get('addr:street')) for element in existing_address_result],
+                shapely.points(overpass_coords(existing_address_result)[0]),
+                shapely.multipoints,
+            )
+
+        with section("  Processing buildings"):
+            existing_buildings = [
+                ExistingBuilding(shape, element)
+                for shape, element in zip(shapely.polygons(overpass_geometries(existing_building_result, shapely.linearrings)), existing_building_result)
+            ]
+
+        with section("  Processing streets"):
+            existing_streets = group_geometries(
+                [element['tags'].get('name') for element in existing_street_result],
+                overpass_geometries(existing_street_result, shapely.linestrings),
+                shapely.multilinestrings,
+            )
+
+        # Only what was built from the raw results is used from here on, so
+        # let them be freed (existing buildings keep their own elements)
+        del existing_address_result, existing_building_result, existing_street_result
 
     with section("Removing input addresses that already exist in OSM"):
         prev_len = len(addresses)
-        addresses = list(filter(lambda addr: addr.address_tuple not in existing_addresses, addresses))
+        addresses = [address for address in addresses if address.address_tuple not in existing_addresses]
+        del existing_addresses
         print(f"  Removed {prev_len - len(addresses)} addresses")
 
+    address_points = np.array([address.location for address in addresses], dtype=object)
+
     with section("Checking input addresses against existing street names"):
-        for address in addresses:
-            if address.tags.get("addr:street") not in existing_streets:
-                address.warn_no_nearby_street()
+        street_indices = { name: i for i, name in enumerate(existing_streets) }
+        address_streets = np.array([street_indices.get(address.tags.get("addr:street"), -1) for address in addresses], dtype=np.intp)
+        near_street = address_streets >= 0
+
+        if opts.max_street_distance is not None:
+            # There's only one (multi-)line per street name, so each address
+            # just has to be tested against its own street
+            streets = np.array(list(existing_streets.values()), dtype=object)
+            shapely.prepare(streets)
+            near_street[near_street] = shapely.dwithin(streets[address_streets[near_street]], address_points[near_street], opts.max_street_distance)
+
+        for address in itertools.compress(addresses, (~near_street).tolist()):
+            address.warn_no_nearby_street()
+
+        del existing_streets
 
     with section("Building spatial index of existing buildings"):
-        existing_bldg_idx = index.Index()
-        for i, bldg in enumerate(existing_buildings):
-            bounds = bldg.shape.bounds
-            if len(bounds) == 4:
-                existing_bldg_idx.add(i, bounds)
+        existing_bldg_tree = shapely.STRtree([bldg.shape for bldg in existing_buildings])
+
+        # Existing buildings are tested against lots of new buildings and
+        # addresses, so build GEOS's prepared geometry for each of them once
+        shapely.prepare(existing_bldg_tree.geometries)
 
     with section("Removing input buildings that already exist in OSM"):
         prev_len = len(buildings)
 
-        def does_not_intersect(bldg):
-            for i in existing_bldg_idx.intersection(bldg.shape.bounds):
-                if existing_buildings[i].shape.intersects(bldg.shape):
-                    return False
-            return True
-
-        buildings = list(filter(does_not_intersect, buildings))
+        duplicates = query_intersects(existing_bldg_tree, np.array([bldg.shape for bldg in buildings], dtype=object))[0]
+        keep = np.ones(len(buildings), dtype=bool)
+        keep[duplicates] = False
+        buildings = [bldg for bldg, k in zip(buildings, keep.tolist()) if k]
 
         print(f"  Removed {prev_len - len(buildings)} buildings")
 
     with section("Building spatial index of new buildings"):
-        new_bldg_idx = index.Index()
-        for i, bldg in enumerate(buildings):
-            bounds = bldg.shape.bounds
-            if len(bounds) == 4:
-                new_bldg_idx.add(i, bounds)
+        new_bldg_tree = shapely.STRtree([bldg.shape for bldg in buildings])
+
+        # A new building is only tested against the few addresses that fall
+        # in its bounding box, so preparing it only pays off once it has
+        # enough vertices
+        new_bldg_shapes = new_bldg_tree.geometries
+        shapely.prepare(new_bldg_shapes[shapely.get_num_coordinates(new_bldg_shapes) >= 20])
 
     # addresses with no building underneath
     lone_addresses = []
 
     with section("Matching input addresses to buildings"):
-        for address in addresses:
-            for i in existing_bldg_idx.intersection(address.location.bounds):
-                if existing_buildings[i].shape.intersects(address.location):
-                    existing_buildings[i].addresses.append(address)
-                    break
+        # Find every (address, building) pair that intersects with one query per
+        # tree. Addresses prefer existing buildings, so only the ones that
+        # didn't hit an existing building are checked against new ones.
+        existing_matches = first_matches(*query_intersects(existing_bldg_tree, address_points), len(addresses))
+
+        unmatched = np.flatnonzero(existing_matches < 0)
+        new_matches = np.full(len(addresses), -1)
+        new_matches[unmatched] = first_matches(*query_intersects(new_bldg_tree, address_points[unmatched]), len(unmatched))
+
+        for address, i, j in zip(addresses, existing_matches.tolist(), new_matches.tolist()):
+            if i >= 0:
+                existing_buildings[i].addresses.append(address)
+            elif j >= 0:
+                buildings[j].addresses.append(address)
             else:
-                for i in new_bldg_idx.intersection(address.location.bounds):
-                    if buildings[i].shape.intersects(address.location):
-                        buildings[i].addresses.append(address)
-                        break
-                else:
-                    lone_addresses.append(address)
+                lone_addresses.append(address)
+
+        # Every address now belongs to a building or the lone addresses, and
+        # the spatial indexes aren't needed for generating changes
+        del addresses, address_points, existing_bldg_tree, new_bldg_tree, new_bldg_shapes
 
     changes = []
     with section("Generating changes"):
@@ -175,78 +229,248 @@ def main():
                     changes += [NewAddressChange(address) for address in building.addresses]
 
     with section("Sorting changes by tile"):
-        tiles = defaultdict(ChangesetEmitter)
-        warned_tiles = defaultdict(ChangesetEmitter)
-        for change in changes:
-            if len(change.warnings) > 0:
-                warned_tiles[change.tile_name].add_change(change)
-            else:
-                tiles[change.tile_name].add_change(change)
+        tiles = {}
+        warned_tiles = {}
+
+        # Group the changes by tile and whether they have warnings with one
+        # sort, keeping their order within each group
+        xtiles, ytiles = tile_indices(changes)
+        warned = np.fromiter((any(change.warnings) for change in changes), dtype=np.int64, count=len(changes))
+        groups, group_indices, group_sizes = np.unique(np.stack((xtiles, ytiles, warned), axis=1), axis=0, return_inverse=True, return_counts=True)
+        group_changes = np.split(np.argsort(group_indices.ravel(), kind="stable"), np.cumsum(group_sizes)[:-1])
+
+        for (xtile, ytile, group_warned), indices in zip(groups.tolist(), group_changes):
+            tile = ChangesetEmitter()
+            tile.add_changes([changes[i] for i in indices.tolist()])
+            (warned_tiles if group_warned else tiles)[f"{xtile}_{ytile}"] = tile
 
     print(f"Generated {len(tiles)} tiles and {len(warned_tiles)} warning tiles")
 
     with section("Generating files"):
-        changeset_tags = { tag.split("=", 1)[0]: tag.split("=", 1)[1] for tag in opts.changeset_tags }
+        changeset_tags = dict(parse_kv_list(opts.changeset_tags))
 
         os.makedirs(os.path.join(opts.output, "changesets"), exist_ok=True)
         os.makedirs(os.path.join(opts.output, "warnings"), exist_ok=True)
 
-        with Pool(opts.jobs) as p:
-            list(p.imap_unordered(PoolFunc(write_tile, os.path.join(opts.output, "changesets"), generator=opts.generator, changeset_tags=changeset_tags), tiles.items()))
-
-        with Pool(opts.jobs) as p:
-            list(p.imap_unordered(PoolFunc(write_tile, os.path.join(opts.output, "warnings"), generator=opts.generator, changeset_tags=changeset_tags), warned_tiles.items()))
+        # Writing is mostly lxml serialization, and threads share the tiles
+        # instead of pickling every change over to worker processes
+        with ThreadPoolExecutor(opts.jobs) as executor:
+            futures = [
+                executor.submit(write_tile, name, tile, os.path.join(opts.output, folder), generator=opts.generator, changeset_tags=changeset_tags)
+                for folder, folder_tiles in (("changesets", tiles), ("warnings", warned_tiles))
+                for name, tile in folder_tiles.items()
+            ]
+            for future in futures:
+                future.result()
 
     print("Done!")
 
 
-def write_tile(arg, folder, **write_to_kwargs):
-    name, tile = arg
+def write_tile(name, tile, folder, **write_to_kwargs):
     filename = f"change-{name}.osm"
     tile.write_to(os.path.join(folder, filename), source_file=filename, **write_to_kwargs)
 
+    # Only create the log file if there's at least one warning
     warnings = tile.warnings
-    if len(warnings):
+    first_warning = next(warnings, None)
+    if first_warning is not None:
         with open(os.path.join(folder, f"warn-{name}.log"), "w") as f:
-            for warning in warnings:
+            for warning in itertools.chain([first_warning], warnings):
                 f.write(warning + "\n")
 
 
-def overpass_to_geom(overpass_el):
-    def point(p):
-        return (p["lon"], p["lat"])
+def query_intersects(tree: shapely.STRtree, geometries: np.ndarray) -> np.ndarray:
+    """
+    Returns the (geometry index, tree index) pairs of `geometries` that
+    intersect geometries in the tree.
+
+    Unlike `tree.query(geometries, predicate="intersects")`, which prepares
+    the query geometries, this evaluates the predicate with the tree's
+    geometries on the left, so prepared tree geometries get used.
+
+    The tree query is the bounding box filter: only pairs whose boxes
+    overlap reach the exact predicate, and GEOS compares envelopes again
+    before any vertex work, so no separate bounds check is needed.
+    """
+
+    query_indices, tree_indices = tree.query(geometries)
+    hits = shapely.intersects(tree.geometries[tree_indices], geometries[query_indices])
+    return np.stack((query_indices[hits], tree_indices[hits]))
+
+
+def first_matches(query_indices: np.ndarray, tree_indices: np.ndarray, count: int) -> np.ndarray:
+    """
+    Given the result of an STRtree query for `count` geometries, returns the
+    lowest matching tree index for each geometry, or -1 if it had no matches.
+    """
+
+    order = np.lexsort((tree_indices, query_indices))
+    queried, first = np.unique(query_indices[order], return_index=True)
+    matches = np.full(count, -1)
+    matches[queried] = tree_indices[order][first]
+    return matches
+
+
+def overpass_points(overpass_el) -> list:
+    """
+    Returns the Overpass points (dicts with "lon" and "lat") of an element: a
+    node itself, a way's geometry, a relation's outer members joined
+    together, or otherwise the element's center.
+    """
 
     if overpass_el["type"] == "node":
-        return point(overpass_el)
+        return [overpass_el]
     elif overpass_el["type"] == "way" and "geometry" in overpass_el:
-        return [point(p) for p in overpass_el["geometry"]]
+        return overpass_el["geometry"]
     elif overpass_el["type"] == "relation" and "members" in overpass_el:
-        return Polygon([
-            p
-            for el in overpass_el["members"]
-            for p in overpass_to_geom(el)
-            if el["role"] == "outer"
-        ])
+        points = []
+        for member in overpass_el["members"]:
+            if member["role"] == "outer":
+                points.extend([member] if member["type"] == "node" else member.get("geometry", []))
+        return points
 
     if "center" in overpass_el:
-        return point(overpass_el["center"])
+        return [overpass_el["center"]]
+    return []
+
+
+def overpass_coords(elements: list) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the (lon, lat) coordinates of all of the Overpass elements as one
+    (n, 2) array, and the number of coordinates belonging to each element.
+    """
+
+    points = [overpass_points(element) for element in elements]
+    counts = np.fromiter(map(len, points), dtype=np.intp, count=len(points))
+    coords = np.fromiter(
+        (c for element_points in points for p in element_points for c in (p["lon"], p["lat"])),
+        dtype=np.float64,
+        count=2 * counts.sum(),
+    )
+    return coords.reshape(-1, 2), counts
+
+
+def overpass_geometries(elements: list, constructor) -> np.ndarray:
+    """
+    Builds a geometry from the coordinates of each Overpass element, with a
+    single call to a vectorized shapely constructor that takes the index of
+    each coordinate's geometry, such as `shapely.linestrings`.
+    """
+
+    coords, counts = overpass_coords(elements)
+    return constructor(coords, indices=np.repeat(np.arange(len(counts)), counts))
+
+
+def group_geometries(keys: list, geometries: np.ndarray, constructor) -> dict:
+    """
+    Collects the geometries sharing a key into one multi-part geometry per
+    key, such as with `shapely.multipoints`, keeping them in their order.
+    """
+
+    groups = {}
+    indices = np.array([groups.setdefault(key, len(groups)) for key in keys], dtype=np.intp)
+    order = np.argsort(indices, kind="stable")
+    return dict(zip(groups, constructor(geometries[order], indices=indices[order])))
 
 
-def overpass_query(query: str):
+def overpass_query(query: str, endpoint: str = OVERPASS_ENDPOINT, max_age: float = None):
     """
     Submits an Overpass query and returns the parsed JSON.
+
+    Responses are cached by endpoint and query. A cached response is reused
+    until it is `max_age` seconds old, or forever if `max_age` is None, and
+    then revalidated with its ETag if the server gave one.
+    """
+
+    cache = overpass_cache()
+    qhash = hashlib.sha256(query.encode()).digest()
+    cached = cache.execute("SELECT etag, ts, body FROM overpass WHERE endpoint = ? AND qhash = ?", (endpoint, qhash)).fetchone()
+    if cached and (max_age is None or time.time() - cached[1] < max_age):
+        return orjson.loads(zlib.decompress(cached[2]))
+
+    headers = {"If-None-Match": cached[0]} if cached and cached[0] else {}
+    response = overpass_session().post(endpoint, data=query, headers=headers)
+    with cache:
+        if cached and response.status_code == 304:
+            cache.execute("UPDATE overpass SET ts = ? WHERE endpoint = ? AND qhash = ?", (int(time.time()), endpoint, qhash))
+            return orjson.loads(zlib.decompress(cached[2]))
+
+        response.raise_for_status()
+        cache.execute(
+            "INSERT OR REPLACE INTO overpass VALUES (?, ?, ?, ?, ?)",
+            (endpoint, qhash, response.headers.get("ETag"), int(time.time()), zlib.compress(response.content)),
+        )
+    return orjson.loads(response.content)
+
+
+@functools.cache
+def overpass_session() -> requests.Session:
+    """
+    Returns the HTTP session used for all Overpass requests, so the connection
+    to the server is kept alive between them. Compressed responses are
+    already accepted by default.
+    """
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@functools.cache
+def overpass_cache() -> sqlite3.Connection:
+    """
+    Opens the Overpass response cache, creating it if needed.
+    """
+
+    cache = sqlite3.connect("importer_cache.sqlite")
+    cache.execute("CREATE TABLE IF NOT EXISTS overpass (endpoint TEXT, qhash BLOB, etag TEXT, ts INTEGER, body BLOB, PRIMARY KEY (endpoint, qhash))")
+    return cache
+
+
+def overpass_query_sets(sets: list[tuple[str, str]], **kwargs) -> list[list]:
+    """
+    Runs several Overpass set statements in a single query and returns the
+    elements of each set.
+
+    Each set is given as a statement and the output statement to print it
+    with. The sets are told apart in the response by the element of an
+    `out count` after each of them.
+    """
+
+    query = "[out:json][timeout:180];"
+    query += "".join(f" {statement}->.s{i};" for i, (statement, out) in enumerate(sets))
+    query += "".join(f" .s{i} {out}; .s{i} out count;" for i, (statement, out) in enumerate(sets))
+
+    results = [[]]
+    for element in overpass_query(query, **kwargs)["elements"]:
+        if element["type"] == "count":
+            results.append([])
+        else:
+            results[-1].append(element)
+    return results[:-1]
+
+
+def read_features(span: tuple[int, int], path: str, from_features, *args):
+    """
+    Reads the features in the range `span` of a shapefile and creates objects
+    from them with `from_features`.
+
+    Used in workers, so that only the range has to be sent to them instead of
+    the features themselves.
+    """
+
+    with collection(path, "r") as shapefile:
+        return from_features(list(shapefile.filter(*span)), *args)
+
+
+def parse_kv_list(items: list[str]) -> list[tuple[str, str]]:
+    """
+    Splits each of a list of key=value arguments into a (key, value) pair.
     """
 
-    path = os.path.join("importer_cache", hashlib.sha256(query.encode()).hexdigest())
-    try:
-        with open(path, "r") as f:
-            return json.load(f)
-    except:
-        data = requests.post("https://overpass-api.de/api/interpreter", data=query).text
-        os.makedirs("importer_cache", exist_ok=True)
-        with open(path, "w") as f:
-            f.write(data)
-        return json.loads(data)
+    return [(key, value) for key, value in (item.split("=", 1) for item in items)]
 
 
 def convert_arg_line_to_args(arg_line: str):